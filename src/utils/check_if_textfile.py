@@ -3,23 +3,25 @@ import pymupdf
 doc = pymupdf.open('data/raw_papers/June 2018 QP - Paper 1 (H) Edexcel Physics GCSE.pdf')
 txtblocks = 0
 imgblocks = 0
-docfonts = []
+docfonts = set()
+
+# "blocks" only gives (x0, y0, x1, y1, text, block_no, block_type) tuples,
+# which is all we need to count; images have to be asked for explicitly.
+blockflags = pymupdf.TEXTFLAGS_BLOCKS | pymupdf.TEXT_PRESERVE_IMAGES
 
 for page in doc:
-    t=page.get_text("dict")
-    for b in t['blocks']:
-        if(b['type']==0):
+    for b in page.get_text("blocks", flags=blockflags):
+        if(b[6]==0):
             txtblocks+=1
-        elif(b['type']==1):
+        elif(b[6]==1):
             imgblocks+=1
 
-pagefonts = page.get_fonts()
-for f in pagefonts:
-    if(f[3] not in tuple(docfonts)):
-        docfonts.append(f[3])
+    pagefonts = page.get_fonts()
+    for f in pagefonts:
+        docfonts.add(f[3])
 print("Text Blocks : ", txtblocks)
 print("Img Blocks : ", imgblocks)
 print("Fonts : ", len(docfonts))
-for ft in docfonts:
+for ft in sorted(docfonts):
     print(ft)
 doc.close()
\ No newline at end of file
@@ -1,11 +1,41 @@
 import fitz  # PyMuPDF
-from PIL import Image, ImageDraw
+from PIL import Image, ImageDraw, ImageFont
+import numpy as np
 import os
+import logging
+import hashlib
+import pickle
+import tempfile
+
+logger = logging.getLogger(__name__)
 
 def pad_rect(rect_pdf, pad):
     x0, y0, x1, y1 = rect_pdf
     return (x0 - pad, y0 - pad, x1 + pad, y1 + pad)
 
+# Bump when the extraction / clustering rules change, to drop old caches
+LAYOUT_CACHE_VERSION = 1
+
+# Label box per overlay kind: (width px, height px, text y-offset px, colour)
+LABEL_BG = {
+    "T": (80, 16, 2, "red"),
+    "I": (80, 16, 2, "green"),
+    "D": (60, 16, 2, "blue"),
+    "DRAW_RAW": (110, 14, 1, "blue"),
+}
+
+def draw_label(draw, x, y, kind, text, font):
+    w, h, dy, color = LABEL_BG[kind]
+    draw.rectangle([x, y, x + w, y + h], fill="white", outline=color, width=1)
+    draw.text((x + 3, y + dy), text, fill=color, font=font)
+
+def save_debug_image(img, path):
+    # Debug images are short-lived: favour encode speed over file size.
+    if path.lower().endswith((".jpg", ".jpeg")):
+        img.save(path, quality=80)
+    else:
+        img.save(path, optimize=False, compress_level=1)
+
 ####################################################
 # 1. Merging logic for drawing rectangles
 ####################################################
@@ -15,66 +45,168 @@ def merge_rects(rects, proximity_tol=2, max_vertical_gap=20):
     Merge rectangles if they overlap / are close, AND their vertical centers
     are not too far apart. This stops chain-merging across the whole page.
     rects are in PDF coords: (x0,y0,x1,y1).
-    """
 
-    merged = []
-
-    def overlap_or_close(a, b):
-        ax0, ay0, ax1, ay1 = a
-        bx0, by0, bx1, by1 = b
+    Each pass takes the last rect as a base and absorbs every remaining rect
+    close to it; passes repeat on the merged boxes until nothing changes.
+    The base-vs-rest test is one NumPy expression instead of a Python loop.
+    """
 
-        # Expand A by a tolerance
-        ax0e = ax0 - proximity_tol
-        ay0e = ay0 - proximity_tol
-        ax1e = ax1 + proximity_tol
-        ay1e = ay1 + proximity_tol
+    def close_to(base, others):
+        ax0, ay0, ax1, ay1 = base
+        bx0, by0, bx1, by1 = others[:, 0], others[:, 1], others[:, 2], others[:, 3]
 
-        # Overlap check
-        overlap_x = not (ax1e < bx0 or bx1 < ax0e)
-        overlap_y = not (ay1e < by0 or by1 < ay0e)
-        if not (overlap_x and overlap_y):
-            return False
+        # Overlap check, with A expanded by a tolerance
+        overlap_x = ~((ax1 + proximity_tol < bx0) | (bx1 < ax0 - proximity_tol))
+        overlap_y = ~((ay1 + proximity_tol < by0) | (by1 < ay0 - proximity_tol))
 
         # Additional guard: don't merge if centers are too far apart vertically
         ayc = (ay0 + ay1) / 2
         byc = (by0 + by1) / 2
-        if abs(ayc - byc) > max_vertical_gap:
-            return False
+        return overlap_x & overlap_y & (np.abs(ayc - byc) <= max_vertical_gap)
 
-        return True
-
-    rects = rects[:]
+    rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
     changed = True
     while changed:
         changed = False
         new_rects = []
 
-        while rects:
-            base = rects.pop()
-            bx0, by0, bx1, by1 = base
-            absorbed = []
-
-            for i, other in enumerate(rects):
-                if overlap_or_close(base, other):
-                    ox0, oy0, ox1, oy1 = other
-                    # Union
-                    bx0 = min(bx0, ox0)
-                    by0 = min(by0, oy0)
-                    bx1 = max(bx1, ox1)
-                    by1 = max(by1, oy1)
-                    absorbed.append(i)
-                    changed = True
+        while len(rects):
+            base = rects[-1]
+            rects = rects[:-1]
+
+            absorbed = close_to(base, rects)
+            if absorbed.any():
+                others = rects[absorbed]
+                # Union
+                bx0 = min(base[0], others[:, 0].min())
+                by0 = min(base[1], others[:, 1].min())
+                bx1 = max(base[2], others[:, 2].max())
+                by1 = max(base[3], others[:, 3].max())
+                changed = True
+            else:
+                bx0, by0, bx1, by1 = base
 
             # Drop 'absorbed' already merged
-            for idx in sorted(absorbed, reverse=True):
-                rects.pop(idx)
+            rects = rects[~absorbed]
 
             new_rects.append((bx0, by0, bx1, by1))
 
-        rects = new_rects[:]
+        rects = np.array(new_rects, dtype=np.float64).reshape(-1, 4)
+
+    return [tuple(r) for r in rects.tolist()]
+
+
+def cluster_drawing_primitives(drawing_primitives, page_w_pdf, page_h_pdf, verbose=False):
+    """
+    Turn the raw drawing primitives of a page into figure-like clusters:
+    drop frames / footer bars / stray rules, merge what's left with
+    merge_rects, then drop page-sized and tiny clusters and pad the rest.
+    Returns the list of cluster dicts (ids D0, D1, ...).
+    """
+    page_area_pdf = page_w_pdf * page_h_pdf if page_w_pdf and page_h_pdf else 1.0
+
+    # Filter drawing primitives BEFORE merging
+    # We'll keep graph-like stuff while trying to remove footer bars + full-page frame.
+    upper_half_limit = page_h_pdf * 0.6  # guess that figure is in top ~60%
+
+    # All primitive boxes as one (N,4) array so the rules below are plain
+    # column arithmetic instead of a per-primitive loop.
+    prim_arr = np.array(
+        [prim["bbox_pdf"] for prim in drawing_primitives], dtype=np.float64
+    ).reshape(-1, 4)
+    x0, y0, x1, y1 = prim_arr[:, 0], prim_arr[:, 1], prim_arr[:, 2], prim_arr[:, 3]
+
+    # consider shapes that extend above the threshold
+    in_band = y1 > upper_half_limit
+    if in_band.any():
+        fig_band_min_y = y0[in_band].min()
+        fig_band_max_y = y1[in_band].max()
+    else:
+        fig_band_min_y = 0
+        fig_band_max_y = page_h_pdf
+
+    w = x1 - x0
+    h = y1 - y0
+    w_ratio = w / page_w_pdf if page_w_pdf else np.zeros_like(w)
+    h_ratio = h / page_h_pdf if page_h_pdf else np.zeros_like(h)
+
+    keep = (w > 0) & (h > 0)
+
+    # RULE A: drop almost-whole-page frames
+    keep &= ~((w_ratio > 0.9) & (h_ratio > 0.9))
+
+    # RULE B: drop very-wide bottom footer lines (barcode area)
+    keep &= ~((y0 < 50) & (w_ratio > 0.5))
+
+    # RULE C: drop super-long skinny horizontals only if BELOW the main figure band
+    long_and_skinny = (w_ratio > 0.6) & (h < 3)
+    below_band = y1 < (fig_band_min_y - 60)  # more forgiving
+    keep &= ~(long_and_skinny & below_band)
+
+    filtered_rects_pdf = [tuple(r) for r in prim_arr[keep].tolist()]
+
+    # Merge filtered rectangles into clusters and post-filter
+    merged_rects_pdf = merge_rects(
+        filtered_rects_pdf,
+        proximity_tol=2,
+        max_vertical_gap=20
+    )
+
+    drawing_clusters = []
+    cluster_idx = 0
 
-    merged.extend(rects)
-    return merged
+    for rect_pdf in merged_rects_pdf:
+        x0, y0, x1, y1 = rect_pdf
+        w = x1 - x0
+        h = y1 - y0
+        area = w * h
+        if area <= 0:
+            if verbose:
+                logger.debug("[drop cluster] zero/nonpositive area %s", rect_pdf)
+            continue
+
+        w_ratio = w / page_w_pdf
+        h_ratio = h / page_h_pdf
+        cover_ratio = area / page_area_pdf
+
+        drop = False
+        drop_reason = None
+
+        # (1) Very big "page frame / page pane" style cluster
+        # drop if it covers most of the page in BOTH width and height
+        if (w_ratio > 0.7 and h_ratio > 0.7):
+            drop = True
+            drop_reason = "looks like large page region (big in both w & h)"
+
+
+
+        # (2) Very tiny noise
+        if area < 1000:
+            drop = True
+            drop_reason = "too small / noise"
+
+        if drop:
+            if verbose:
+                logger.debug("[drop cluster] %s reason: %s (w_ratio=%.2f, h_ratio=%.2f, area=%.1f)",
+                             rect_pdf, drop_reason, w_ratio, h_ratio, area)
+            continue
+
+        PADDING_PDF = 5  # tune if you want a tighter/looser fit
+
+        padded_rect = pad_rect(rect_pdf, PADDING_PDF)
+
+        drawing_clusters.append({
+            "id": f"D{cluster_idx}",
+            "bbox_pdf": padded_rect,
+            "w_ratio": w_ratio,
+            "h_ratio": h_ratio,
+            "area": area,
+            "y_range": (y0, y1),
+        })
+    
+        cluster_idx += 1
+
+    return drawing_clusters
 
 
 ####################################################
@@ -100,122 +232,77 @@ def make_coordinate_grid_image(
     We assume: pixel_x = pdf_x * zoom, pixel_y = pdf_y * zoom
                (which is the same transform we use for boxes)
     """
-    img = Image.frombytes("RGB", [base_pix.width, base_pix.height], base_pix.samples)
+    # samples_mv is a view on the pixmap's own memory, so the only copy is
+    # the one into the Pillow image (pix.samples would make a bytes copy first)
+    img = Image.frombytes("RGB", [base_pix.width, base_pix.height], base_pix.samples_mv)
     draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default()
+
+    w_px, h_px = base_pix.width, base_pix.height
+    xs_pdf = np.arange(int(page_w_pdf // step_pdf) + 1) * step_pdf
+    ys_pdf = np.arange(int(page_h_pdf // step_pdf) + 1) * step_pdf
 
+    # All lines of one axis go out as a single zig-zag polyline. The joining
+    # segments run along x=0 / y=0 (grid lines anyway) or just off the image.
     # Vertical grid lines (x = const in PDF coords)
-    x_pdf = 0
-    while x_pdf <= page_w_pdf:
-        x_px = x_pdf * zoom
-        draw.line([(x_px, 0), (x_px, base_pix.height)], fill=grid_color, width=1)
-        # label at top
-        label = f"x={int(x_pdf)}"
-        draw.text((x_px + 2, 2), label, fill=label_font_color)
-        x_pdf += step_pdf
+    path = []
+    for i, x_px in enumerate((xs_pdf * zoom).tolist()):
+        ends = [(x_px, 0), (x_px, h_px)]
+        path.extend(ends if i % 2 == 0 else ends[::-1])
+    if len(path) > 1:
+        draw.line(path, fill=grid_color, width=1)
 
     # Horizontal grid lines (y = const in PDF coords)
-    y_pdf = 0
-    while y_pdf <= page_h_pdf:
-        y_px = y_pdf * zoom
-        draw.line([(0, y_px), (base_pix.width, y_px)], fill=grid_color, width=1)
-        # label at left
-        label = f"y={int(y_pdf)}"
-        draw.text((2, y_px + 2), label, fill=label_font_color)
-        y_pdf += step_pdf
+    path = []
+    for i, y_px in enumerate((ys_pdf * zoom).tolist()):
+        ends = [(0, y_px), (w_px, y_px)]
+        path.extend(ends if i % 2 == 0 else ends[::-1])
+    if len(path) > 1:
+        draw.line(path, fill=grid_color, width=1)
 
-    img.save(save_path)
-    print("Saved COORD GRID image:", save_path)
+    # Labels: x at top, y at left
+    for x_pdf in xs_pdf.tolist():
+        draw.text((x_pdf * zoom + 2, 2), f"x={int(x_pdf)}", fill=label_font_color, font=font)
+    for y_pdf in ys_pdf.tolist():
+        draw.text((2, y_pdf * zoom + 2), f"y={int(y_pdf)}", fill=label_font_color, font=font)
+
+    save_debug_image(img, save_path)
+    logger.info("Saved COORD GRID image: %s", save_path)
 
 
 ####################################################
 # 3. Main visualizer
 ####################################################
 
-def visualize_layout_debug(
-    pdf_path,
-    page_num=0,
-    dpi=150,
-    save_dir="Projects/exam_paper_parser_V1.0/data/raw_papers/pdf_layout",
-    show_labels=True
-):
+def extract_layout(page, tp, page_w_pdf, page_h_pdf, verbose=False):
     """
-    Produces three debug images for a given PDF page:
-      1. RAW layout: text (red), images (green), raw drawing prims (blue thin)
-      2. MERGED layout: text (red), images (green), merged clusters (blue thick)
-      3. COORD GRID layout: page raster + PDF coordinate grid labels
-
-    Also prints:
-      TEXT BLOCKS (red)
-      IMAGE BLOCKS (green)
-      DRAWING PRIMITIVES (blue RAW)
-      FINAL drawing_clusters (blue MERGED)
+    Everything visualize_layout_debug needs to know about a page, before any
+    drawing: text/image blocks, raw drawing primitives and merged clusters.
+    Only plain lists / dicts / tuples, so the result can be pickled.
     """
-
-    os.makedirs(save_dir, exist_ok=True)
-
-    # -----------------
-    # Open and render
-    # -----------------
-    doc = fitz.open(pdf_path)
-    page = doc[page_num]
-
-    page_rect = page.rect
-    page_w_pdf = float(page_rect.x1 - page_rect.x0)
-    page_h_pdf = float(page_rect.y1 - page_rect.y0)
-    page_area_pdf = page_w_pdf * page_h_pdf if page_w_pdf and page_h_pdf else 1.0
-
-    zoom = dpi / 72.0
-    mat = fitz.Matrix(zoom, zoom)
-    pix = page.get_pixmap(matrix=mat)
-
-    raw_img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-    merged_img = raw_img.copy()
-
-    raw_draw = ImageDraw.Draw(raw_img)
-    merged_draw = ImageDraw.Draw(merged_img)
-
-    # Coordinate transform for boxes:
-    # On your PDF we discovered just scaling is enough (no Y-flip).
-    def bbox_pdf_to_img_scaled(bbox_pdf):
-        x0, y0, x1, y1 = bbox_pdf
-        sx0, sy0 = x0 * zoom, y0 * zoom
-        sx1, sy1 = x1 * zoom, y1 * zoom
-        left, right = sx0, sx1
-        top, bottom = sy0, sy1
-        if top > bottom:
-            top, bottom = bottom, top
-        return (left, top, right, bottom)
-
     # -----------------
     # 1. Extract text/image blocks
     # -----------------
     text_blocks = []
     image_blocks = []
 
-    page_dict = page.get_text("dict")
-    for b_idx, block in enumerate(page_dict["blocks"]):
-        bbox_pdf = tuple(block["bbox"])
-        btype = block.get("type", 0)
-
-        # collect any text spans
-        spans_text = []
-        if "lines" in block:
-            for line in block["lines"]:
-                for span in line["spans"]:
-                    spans_text.append(span["text"])
-        joined_text = " ".join(spans_text).strip()
+    # Only bbox, type and text are needed, so the flat "blocks" tuples are
+    # enough; no need to build the nested blocks -> lines -> spans dicts.
+    blocks = tp.extractBLOCKS()
+    for b_idx, (x0, y0, x1, y1, txt, bno, btype) in enumerate(blocks):
+        bbox_pdf = (x0, y0, x1, y1)
 
         if btype == 0:
             text_blocks.append({
                 "id": f"T{b_idx}",
                 "bbox_pdf": bbox_pdf,
-                "text": joined_text,
+                "text": txt.replace("\n", " ").strip(),
             })
         elif btype == 1:
             image_blocks.append({
                 "id": f"I{b_idx}",
                 "bbox_pdf": bbox_pdf,
-                "text": joined_text,
+                "text": "",
             })
         else:
             pass
@@ -236,199 +323,223 @@ def visualize_layout_debug(
         })
 
     # -----------------
-    # 3. Filter drawing primitives BEFORE merging
+    # 3. Filter, merge and post-filter drawing primitives into clusters
     # -----------------
-    # We'll keep graph-like stuff while trying to remove footer bars + full-page frame.
-    upper_half_limit = page_h_pdf * 0.6  # guess that figure is in top ~60%
-
-    fig_band_ymins = []
-    fig_band_ymaxs = []
-    for prim in drawing_primitives:
-        x0, y0, x1, y1 = prim["bbox_pdf"]
-        # consider shapes that extend above the threshold
-        if y1 > upper_half_limit:
-            fig_band_ymins.append(y0)
-            fig_band_ymaxs.append(y1)
-
-    if fig_band_ymins and fig_band_ymaxs:
-        fig_band_min_y = min(fig_band_ymins)
-        fig_band_max_y = max(fig_band_ymaxs)
+    # Text-only pages (most of an exam paper) have nothing to cluster, so
+    # skip the whole filter / merge step for them.
+    if drawing_primitives:
+        drawing_clusters = cluster_drawing_primitives(
+            drawing_primitives, page_w_pdf, page_h_pdf, verbose
+        )
     else:
-        fig_band_min_y = 0
-        fig_band_max_y = page_h_pdf
+        drawing_clusters = []
 
-    filtered_rects_pdf = []
-
-    for prim in drawing_primitives:
-        x0, y0, x1, y1 = prim["bbox_pdf"]
-        w = x1 - x0
-        h = y1 - y0
-        if w <= 0 or h <= 0:
-            continue
-
-        w_ratio = w / page_w_pdf if page_w_pdf else 0
-        h_ratio = h / page_h_pdf if page_h_pdf else 0
+    return {
+        "text_blocks": text_blocks,
+        "image_blocks": image_blocks,
+        "drawing_primitives": drawing_primitives,
+        "drawing_clusters": drawing_clusters,
+    }
 
-        # RULE A: drop almost-whole-page frames
-        if (w_ratio > 0.9 and h_ratio > 0.9):
-            continue
 
-        # RULE B: drop very-wide bottom footer lines (barcode area)
-        if y0 < 50 and w_ratio > 0.5:
-            continue
+def layout_cache_path(cache_dir, pdf_path, page_num):
+    """
+    Cache file for one page's extract_layout() result. Keyed on the PDF's
+    path, size and mtime (cheap to get, unlike hashing the whole file), the
+    page number and LAYOUT_CACHE_VERSION.
+    """
+    st = os.stat(pdf_path)
+    key = f"{os.path.abspath(pdf_path)}|{st.st_size}|{st.st_mtime_ns}|{page_num}|{LAYOUT_CACHE_VERSION}"
+    return os.path.join(cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".pkl")
 
-        # RULE C: drop super-long skinny horizontals only if BELOW the main figure band
-        long_and_skinny = (w_ratio > 0.6 and h < 3)
-        below_band = (y1 < (fig_band_min_y - 60))  # more forgiving
-        if long_and_skinny and below_band:
-            continue
 
+def load_cached_layout(cache_path):
+    """
+    Return the cached layout, or None on a miss. A missing, truncated or
+    otherwise unreadable file (e.g. left by a crashed run) counts as a miss.
+    """
+    try:
+        with open(cache_path, "rb") as fh:
+            layout = pickle.load(fh)
+    except FileNotFoundError:
+        return None
+    except Exception as exc:
+        logger.debug("Ignoring unreadable layout cache %s: %s", cache_path, exc)
+        return None
+    return layout if isinstance(layout, dict) else None
+
+
+def save_cached_layout(cache_path, layout):
+    """
+    Write the pickle to a temp file next to it and os.replace() it into
+    place, so readers never see a half-written cache file. A write that
+    fails (read-only or full disk, ...) is logged and skipped: the page is
+    simply extracted again next time.
+    """
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            pickle.dump(layout, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except BaseException as exc:
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        if not isinstance(exc, OSError):
+            raise
+        logger.debug("Could not write layout cache %s: %s", cache_path, exc)
 
-        filtered_rects_pdf.append(prim["bbox_pdf"])
 
-    # -----------------
-    # 4. Merge filtered rectangles into clusters and post-filter
-    # -----------------
-    merged_rects_pdf = merge_rects(
-        filtered_rects_pdf,
-        proximity_tol=2,
-        max_vertical_gap=20
-    )
+def visualize_layout_debug(
+    pdf_path,
+    page_num=0,
+    dpi=96,
+    save_dir="Projects/exam_paper_parser_V1.0/data/raw_papers/pdf_layout",
+    show_labels=True,
+    image_format="png",
+    verbose=False,
+    cache_dir=None
+):
+    """
+    Produces three debug images for a given PDF page:
+      1. RAW layout: text (red), images (green), raw drawing prims (blue thin)
+      2. MERGED layout: text (red), images (green), merged clusters (blue thick)
+      3. COORD GRID layout: page raster + PDF coordinate grid labels
 
-    drawing_clusters = []
-    cluster_idx = 0
+    Saved paths are logged at INFO. With verbose=True it also logs, at DEBUG:
+      TEXT BLOCKS (red)
+      IMAGE BLOCKS (green)
+      DRAWING PRIMITIVES (blue RAW)
+      FINAL drawing_clusters (blue MERGED)
+    plus the clusters dropped while merging, when the layout is extracted
+    rather than loaded from cache_dir.
 
-    for rect_pdf in merged_rects_pdf:
-        x0, y0, x1, y1 = rect_pdf
-        w = x1 - x0
-        h = y1 - y0
-        area = w * h
-        if area <= 0:
-            print("[drop cluster] zero/nonpositive area", rect_pdf)
-            continue
+    dpi is the raster resolution of the debug images. 96 is enough to check
+    the boxes; only raise it (e.g. 150) for publication-quality overlays.
+    Labels are drawn at a fixed pixel size, so they stay readable either way.
 
-        w_ratio = w / page_w_pdf
-        h_ratio = h / page_h_pdf
-        cover_ratio = area / page_area_pdf
+    image_format ("png" or "jpeg") applies to the RAW / MERGED images; the
+    mostly flat COORD GRID image is always a PNG.
 
-        drop = False
-        drop_reason = None
+    With cache_dir set, the extracted blocks / primitives / clusters are
+    pickled there per page and reused on later runs over the same file, so
+    only the rendering and drawing are redone.
+    """
 
-        # (1) Very big "page frame / page pane" style cluster
-        # drop if it covers most of the page in BOTH width and height
-        if (w_ratio > 0.7 and h_ratio > 0.7):
-            drop = True
-            drop_reason = "looks like large page region (big in both w & h)"
+    # Callers running many pages create the directories once up front;
+    # this only covers direct calls.
+    os.makedirs(save_dir, exist_ok=True)
+    path_prefix = os.path.join(save_dir, f"page_{page_num}_")
 
+    # -----------------
+    # Open and render
+    # -----------------
+    doc = fitz.open(pdf_path)
+    page = doc[page_num]
 
+    page_rect = page.rect
+    page_w_pdf = float(page_rect.x1 - page_rect.x0)
+    page_h_pdf = float(page_rect.y1 - page_rect.y0)
 
-        # (2) Very tiny noise
-        if area < 1000:
-            drop = True
-            drop_reason = "too small / noise"
+    zoom = dpi / 72.0
+    mat = fitz.Matrix(zoom, zoom)
 
-        if drop:
-            print("[drop cluster]", rect_pdf,
-                  "reason:", drop_reason,
-                  f"(w_ratio={w_ratio:.2f}, h_ratio={h_ratio:.2f}, area={area:.1f})")
-            continue
+    # A cached layout means only the raster is needed from MuPDF
+    layout = None
+    cache_path = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_path = layout_cache_path(cache_dir, pdf_path, page_num)
+        layout = load_cached_layout(cache_path)
+
+    if layout is None:
+        # Interpret the page content only once: both the raster and the
+        # text extraction are derived from the same display list.
+        dl = page.get_displaylist()
+        pix = dl.get_pixmap(matrix=mat, alpha=False)
+        tp = dl.get_textpage(flags=fitz.TEXTFLAGS_DICT)
+        if not isinstance(tp, fitz.TextPage):
+            # newer PyMuPDF hands back the raw MuPDF object here
+            tp = fitz.TextPage(tp)
+    else:
+        pix = page.get_pixmap(matrix=mat, alpha=False)
 
-        PADDING_PDF = 5  # tune if you want a tighter/looser fit
+    # Read the pixmap through its memoryview: no intermediate bytes copy.
+    # (Image.frombuffer can't map RGB data and would copy it anyway.)
+    raw_img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples_mv)
+    raw_draw = ImageDraw.Draw(raw_img)
 
-        padded_rect = pad_rect(rect_pdf, PADDING_PDF)
+    # Coordinate transform for boxes:
+    # On your PDF we discovered just scaling is enough (no Y-flip).
+    # MuPDF boxes always have y0 < y1, so no top/bottom swap is needed and a
+    # whole category converts with a single array multiply.
+    def bboxes_pdf_to_img_scaled(items):
+        boxes_pdf = np.array([it["bbox_pdf"] for it in items], dtype=np.float64)
+        return (boxes_pdf.reshape(-1, 4) * zoom).tolist()
 
-        drawing_clusters.append({
-            "id": f"D{cluster_idx}",
-            "bbox_pdf": padded_rect,
-            "w_ratio": w_ratio,
-            "h_ratio": h_ratio,
-            "area": area,
-            "y_range": (y0, y1),
-        })
-    
-        cluster_idx += 1
+    # -----------------
+    # 1.-3. Extract blocks, drawing primitives and clusters (or load them)
+    # -----------------
+    if layout is None:
+        layout = extract_layout(page, tp, page_w_pdf, page_h_pdf, verbose)
+        if cache_path:
+            save_cached_layout(cache_path, layout)
 
-    print("FINAL drawing_clusters:")
-    for dc in drawing_clusters:
-        print(" ", dc["id"], dc["bbox_pdf"],
-              f"(w_ratio={dc['w_ratio']:.2f}, h_ratio={dc['h_ratio']:.2f}, area={dc['area']:.1f})")
+    text_blocks = layout["text_blocks"]
+    image_blocks = layout["image_blocks"]
+    drawing_primitives = layout["drawing_primitives"]
+    drawing_clusters = layout["drawing_clusters"]
 
     # -----------------
-    # 5. Draw RAW layout
+    # 4. Draw RAW layout
     # -----------------
-    for tb in text_blocks:
-        box_img = bbox_pdf_to_img_scaled(tb["bbox_pdf"])
-        raw_draw.rectangle(box_img, outline="red", width=2)
-        if show_labels:
-            lx, ly = box_img[0], box_img[1]
-            raw_draw.rectangle([lx, ly, lx+80, ly+16], fill="white", outline="red", width=1)
-            raw_draw.text((lx+3, ly+2), tb["id"], fill="red")
-
-    for ib in image_blocks:
-        box_img = bbox_pdf_to_img_scaled(ib["bbox_pdf"])
-        raw_draw.rectangle(box_img, outline="green", width=2)
-        if show_labels:
-            lx, ly = box_img[0], box_img[1]
-            raw_draw.rectangle([lx, ly, lx+80, ly+16], fill="white", outline="green", width=1)
-            raw_draw.text((lx+3, ly+2), ib["id"], fill="green")
-
-    for dp in drawing_primitives:
-        box_img = bbox_pdf_to_img_scaled(dp["bbox_pdf"])
-        raw_draw.rectangle(box_img, outline="blue", width=1)
-        if show_labels:
-            lx, ly = box_img[0], box_img[1]
-            label = dp["id"]
-            raw_draw.rectangle([lx, ly, lx+110, ly+14], fill="white", outline="blue", width=1)
-            raw_draw.text((lx+3, ly+1), label, fill="blue")
-
-    raw_path = os.path.join(
-        save_dir,
-        f"page_{page_num}_raw_layout.png"
-    )
-    raw_img.save(raw_path)
-    print("Saved RAW layout image:", raw_path)
+    # One shared font, and every box converted to pixels exactly once.
+    font = ImageFont.load_default()
+
+    text_boxes_px = bboxes_pdf_to_img_scaled(text_blocks)
+    image_boxes_px = bboxes_pdf_to_img_scaled(image_blocks)
+    prim_boxes_px = bboxes_pdf_to_img_scaled(drawing_primitives)
+    cluster_boxes_px = bboxes_pdf_to_img_scaled(drawing_clusters)
+
+    def draw_layer(draw, boxes_px, items, kind, width):
+        color = LABEL_BG[kind][3]
+        # box then its label, block by block, so overlaps stack as before
+        for box_img, item in zip(boxes_px, items):
+            draw.rectangle(box_img, outline=color, width=width)
+            if show_labels:
+                draw_label(draw, box_img[0], box_img[1], kind, item["id"], font)
+
+    draw_layer(raw_draw, text_boxes_px, text_blocks, "T", 2)
+    draw_layer(raw_draw, image_boxes_px, image_blocks, "I", 2)
+    draw_layer(raw_draw, prim_boxes_px, drawing_primitives, "DRAW_RAW", 1)
+
+    raw_path = f"{path_prefix}raw_layout.{image_format}"
+    save_debug_image(raw_img, raw_path)
+    logger.info("Saved RAW layout image: %s", raw_path)
 
     # -----------------
-    # 6. Draw MERGED layout
+    # 5. Draw MERGED layout
     # -----------------
-    for tb in text_blocks:
-        box_img = bbox_pdf_to_img_scaled(tb["bbox_pdf"])
-        merged_draw.rectangle(box_img, outline="red", width=2)
-        if show_labels:
-            lx, ly = box_img[0], box_img[1]
-            merged_draw.rectangle([lx, ly, lx+80, ly+16], fill="white", outline="red", width=1)
-            merged_draw.text((lx+3, ly+2), tb["id"], fill="red")
-
-    for ib in image_blocks:
-        box_img = bbox_pdf_to_img_scaled(ib["bbox_pdf"])
-        merged_draw.rectangle(box_img, outline="green", width=2)
-        if show_labels:
-            lx, ly = box_img[0], box_img[1]
-            merged_draw.rectangle([lx, ly, lx+80, ly+16], fill="white", outline="green", width=1)
-            merged_draw.text((lx+3, ly+2), ib["id"], fill="green")
-
-    for dc in drawing_clusters:
-        box_img = bbox_pdf_to_img_scaled(dc["bbox_pdf"])
-        merged_draw.rectangle(box_img, outline="blue", width=3)
-        if show_labels:
-            lx, ly = box_img[0], box_img[1]
-            merged_draw.rectangle([lx, ly, lx+60, ly+16], fill="white", outline="blue", width=1)
-            merged_draw.text((lx+3, ly+2), dc["id"], fill="blue")
-
-    merged_path = os.path.join(
-        save_dir,
-        f"page_{page_num}_merged_layout.png"
-    )
-    merged_img.save(merged_path)
-    print("Saved MERGED layout image:", merged_path)
+    # A clean page from the same pixmap (one copy, like RAW): text / image
+    # boxes plus the merged clusters, without the raw primitives.
+    merged_img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples_mv)
+    merged_draw = ImageDraw.Draw(merged_img)
+
+    draw_layer(merged_draw, text_boxes_px, text_blocks, "T", 2)
+    draw_layer(merged_draw, image_boxes_px, image_blocks, "I", 2)
+    draw_layer(merged_draw, cluster_boxes_px, drawing_clusters, "D", 3)
+
+    merged_path = f"{path_prefix}merged_layout.{image_format}"
+    save_debug_image(merged_img, merged_path)
+    logger.info("Saved MERGED layout image: %s", merged_path)
 
     # -----------------
-    # 7. Draw COORD GRID layout
+    # 6. Draw COORD GRID layout
     # -----------------
-    coord_grid_path = os.path.join(
-        save_dir,
-        f"page_{page_num}_coord_grid.png"
-    )
+    coord_grid_path = f"{path_prefix}coord_grid.png"
     make_coordinate_grid_image(
         base_pix=pix,
         page_w_pdf=page_w_pdf,
@@ -441,34 +552,29 @@ def visualize_layout_debug(
     )
 
     # -----------------
-    # 8. Console debug info
+    # 7. Console debug info
     # -----------------
-    print("\n=== TEXT BLOCKS (red) ===")
-    for tb in text_blocks:
-        print(tb["id"])
-        print(" pdf bbox:", tb["bbox_pdf"])
-        print(" text:", tb["text"][:200].replace("\n", " "))
-        print()
-
-    print("=== IMAGE BLOCKS (green) ===")
-    for ib in image_blocks:
-        print(ib["id"])
-        print(" pdf bbox:", ib["bbox_pdf"])
-        print(" note (usually empty):", ib["text"][:80])
-        print()
-
-    print("=== DRAWING PRIMITIVES (blue RAW) ===")
-    for dp in drawing_primitives:
-        print(dp["id"])
-        print(" pdf bbox:", dp["bbox_pdf"])
-        print(" color:", dp["color"], " fill:", dp["fill"])
-        print()
-
-    print("=== FINAL DRAWING CLUSTERS (blue MERGED) ===")
-    for dc in drawing_clusters:
-        print(dc["id"])
-        print(" pdf bbox:", dc["bbox_pdf"])
-        print()
+    # Skipped entirely (including the string slicing) unless asked for
+    if verbose and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("=== TEXT BLOCKS (red) ===")
+        for tb in text_blocks:
+            logger.debug("%s\n pdf bbox: %s\n text: %s\n",
+                         tb["id"], tb["bbox_pdf"], tb["text"][:200].replace("\n", " "))
+
+        logger.debug("=== IMAGE BLOCKS (green) ===")
+        for ib in image_blocks:
+            logger.debug("%s\n pdf bbox: %s\n note (usually empty): %s\n",
+                         ib["id"], ib["bbox_pdf"], ib["text"][:80])
+
+        logger.debug("=== DRAWING PRIMITIVES (blue RAW) ===")
+        for dp in drawing_primitives:
+            logger.debug("%s\n pdf bbox: %s\n color: %s  fill: %s\n",
+                         dp["id"], dp["bbox_pdf"], dp["color"], dp["fill"])
+
+        logger.debug("=== FINAL DRAWING CLUSTERS (blue MERGED) ===")
+        for dc in drawing_clusters:
+            logger.debug("%s\n pdf bbox: %s\n w_ratio=%.2f, h_ratio=%.2f, area=%.1f\n",
+                         dc["id"], dc["bbox_pdf"], dc["w_ratio"], dc["h_ratio"], dc["area"])
 
     doc.close()
 
@@ -491,12 +597,17 @@ if __name__ == "__main__":
     pdf_path = "data/raw_papers/June 2018 QP - Paper 1 (H) Edexcel Physics GCSE.pdf"
     page_num = 2  # sonar graph page in your screenshots
     save_dir_tmp = "data/raw_papers/pdf_layout"
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+    cache_dir_tmp = os.path.join(save_dir_tmp, "cache")
+    os.makedirs(cache_dir_tmp, exist_ok=True)  # creates save_dir_tmp too
 
     visualize_layout_debug(
         pdf_path,
         page_num=page_num,
-        dpi=150,
+        dpi=96,
         save_dir=save_dir_tmp,
-        show_labels=True
+        cache_dir=cache_dir_tmp,
+        show_labels=True,
+        verbose=True
     )
 